@@ -491,6 +491,14 @@ class build_ext(Command):
             self._build_extensions_serial()
             return
 
+        if hasattr(self.compiler, 'parallel'):
+            # the compiler can also build the sources of one extension in
+            # parallel; split the workers so no more than 'workers'
+            # compiler processes run at once
+            ext_workers = max(1, min(workers, len(self.extensions)))
+            self.compiler.parallel = workers // ext_workers
+            workers = ext_workers
+
         with ThreadPoolExecutor(max_workers=workers) as executor:
             futures = [
                 executor.submit(self.build_extension, ext) for ext in self.extensions
@@ -6,13 +6,16 @@ the Mingw32CCompiler class which handles the mingw32 port of GCC (same as
 cygwin in no-cygwin mode).
 """
 
-import copy
+import functools
+import locale
 import os
-import pathlib
 import re
 import shlex
 import sys
+import tempfile
+import threading
 import warnings
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from subprocess import check_output
 
 from ._collections import RangeMap
@@ -26,6 +29,9 @@ from .file_util import write_file
 from .unixccompiler import UnixCCompiler
 from .version import LooseVersion, suppress_known_deprecation
 
+# Keys are the lowest MSC_VER of each toolset; later minor releases
+# (e.g. 1929 for VS2019) must resolve to the preceding entry, so this
+# can't be a plain dict keyed on exact versions.
 _msvcr_lookup = RangeMap.left(
     {
         # MSVC 7.0
@@ -48,12 +54,18 @@ _msvcr_lookup = RangeMap.left(
     },
 )
 
+_msc_ver_re = re.compile(r'MSC v\.(\d{4})')
 
+
+@functools.lru_cache(maxsize=1)
 def get_msvcr():
     """Include the appropriate MSVC runtime library if Python was built
     with MSVC 7.0 or later.
+
+    The result is cached for the life of the process; call
+    get_msvcr.cache_clear() after changing sys.version.
     """
-    match = re.search(r'MSC v\.(\d{4})', sys.version)
+    match = _msc_ver_re.search(sys.version)
     try:
         msc_ver = int(match.group(1))
     except AttributeError:
@@ -69,6 +81,45 @@ _runtime_library_dirs_msg = (
     "usually indicated by `runtime_library_dirs` parameter to Extension"
 )
 
+# set once the message above has been shown by a CygwinCCompiler
+_runtime_library_dirs_warned = False
+
+# per-thread output file of a parallel compile() worker, and the lock
+# that keeps the workers' output blocks from interleaving
+_worker = threading.local()
+_output_lock = threading.Lock()
+
+
+def _write_output(data):
+    """Write the captured bytes of a compiler process to stderr as is."""
+    if not data:
+        return
+    with _output_lock:
+        sys.stderr.flush()
+        buffer = getattr(sys.stderr, 'buffer', None)
+        if buffer is not None:
+            buffer.write(data)
+            buffer.flush()
+        else:
+            # no byte stream to write to; assume the locale's encoding
+            encoding = locale.getpreferredencoding(False)
+            sys.stderr.write(data.decode(encoding, errors='replace'))
+            sys.stderr.flush()
+
+
+def _build_exec_dict(cc, cxx, linker_dll, mcygwin):
+    """Return the set_executables() keywords for the given commands,
+    targeting cygwin if 'mcygwin' is true.
+    """
+    target = ' -mcygwin' if mcygwin else ''
+    return dict(
+        compiler=f'{cc}{target} -O -Wall',
+        compiler_so=f'{cc}{target} -mdll -O -Wall',
+        compiler_cxx=f'{cxx}{target} -O -Wall',
+        linker_exe=f'{cc}{target}',
+        linker_so=f'{linker_dll}{target} -shared',
+    )
+
 
 class CygwinCCompiler(UnixCCompiler):
     """Handles the Cygwin port of the GNU C compiler to Windows."""
@@ -83,6 +134,10 @@ class CygwinCCompiler(UnixCCompiler):
     dylib_lib_format = "cyg%s%s"
     exe_extension = ".exe"
 
+    # number of sources compile() builds at once: None (the default) or 1
+    # to compile serially, True for one per CPU; set by build_ext --parallel
+    parallel = None
+
     def __init__(self, verbose=0, dry_run=0, force=0):
         super().__init__(verbose, dry_run, force)
 
@@ -99,14 +154,9 @@ class CygwinCCompiler(UnixCCompiler):
         self.cxx = os.environ.get('CXX', 'g++')
 
         self.linker_dll = self.cc
-        shared_option = "-shared"
 
         self.set_executables(
-            compiler='%s -mcygwin -O -Wall' % self.cc,
-            compiler_so='%s -mcygwin -mdll -O -Wall' % self.cc,
-            compiler_cxx='%s -mcygwin -O -Wall' % self.cxx,
-            linker_exe='%s -mcygwin' % self.cc,
-            linker_so=(f'{self.linker_dll} -mcygwin {shared_option}'),
+            **_build_exec_dict(self.cc, self.cxx, self.linker_dll, mcygwin=True)
         )
 
         # Include the appropriate MSVC runtime library if Python was built
@@ -128,6 +178,84 @@ class CygwinCCompiler(UnixCCompiler):
         with suppress_known_deprecation():
             return LooseVersion("11.2.0")
 
+    def compile(
+        self,
+        sources,
+        output_dir=None,
+        macros=None,
+        include_dirs=None,
+        debug=0,
+        extra_preargs=None,
+        extra_postargs=None,
+        depends=None,
+    ):
+        """Compile the sources, concurrently if 'self.parallel' is set.
+
+        Each worker's compiler output is written to stderr as one block
+        once the source is done.  On the first failure, sources not yet
+        started are skipped and the error is raised once the running ones
+        finish.  Parallel mode requires _compile() not to modify the
+        compiler instance.
+        """
+        workers = os.cpu_count() if self.parallel is True else self.parallel
+        if self.dry_run or not workers or workers < 2:
+            return super().compile(
+                sources,
+                output_dir,
+                macros,
+                include_dirs,
+                debug,
+                extra_preargs,
+                extra_postargs,
+                depends,
+            )
+
+        macros, objects, extra_postargs, pp_opts, build = self._setup_compile(
+            output_dir, macros, include_dirs, sources, depends, extra_postargs
+        )
+        cc_args = self._get_cc_args(pp_opts, debug, extra_preargs)
+
+        failed = threading.Event()
+
+        def _single_compile(obj):
+            if failed.is_set():
+                return
+            src, ext = build[obj]
+            with tempfile.TemporaryFile() as output:
+                _worker.output = output
+                try:
+                    self._compile(obj, src, ext, cc_args, extra_postargs, pp_opts)
+                except BaseException:
+                    failed.set()
+                    raise
+                finally:
+                    _worker.output = None
+                    output.seek(0)
+                    _write_output(output.read())
+
+        pending = [obj for obj in objects if obj in build]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_single_compile, obj) for obj in pending]
+            # like a serial build, stop at the first failure: sources
+            # that haven't started are dropped (or skipped, if a worker
+            # picked them up first), running ones finish
+            _, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+            for future in not_done:
+                future.cancel()
+            for future in futures:
+                if not future.cancelled():
+                    future.result()
+
+        # Return *all* object filenames, not just the ones we just built.
+        return objects
+
+    def spawn(self, cmd, **kwargs):
+        # inside a parallel compile() worker, collect the program's output
+        output = getattr(_worker, 'output', None)
+        if output is not None:
+            kwargs.setdefault('output', output)
+        super().spawn(cmd, **kwargs)
+
     def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
         """Compiles the source by spawning GCC and windres if needed."""
         if ext in ('.rc', '.res'):
@@ -138,9 +266,8 @@ class CygwinCCompiler(UnixCCompiler):
                 raise CompileError(msg)
         else:  # for other files use the C-compiler
             try:
-                self.spawn(
-                    self.compiler_so + cc_args + [src, '-o', obj] + extra_postargs
-                )
+                cmd = [*self.compiler_so, *cc_args, src, '-o', obj, *extra_postargs]
+                self.spawn(cmd)
             except DistutilsExecError as msg:
                 raise CompileError(msg)
 
@@ -162,19 +289,19 @@ class CygwinCCompiler(UnixCCompiler):
     ):
         """Link the objects."""
         # use separate copies, so we can modify the lists
-        extra_preargs = copy.copy(extra_preargs or [])
-        libraries = copy.copy(libraries or [])
-        objects = copy.copy(objects or [])
+        extra_preargs = list(extra_preargs or [])
+        libraries = list(libraries or [])
+        objects = list(objects or [])
 
         if runtime_library_dirs:
-            self.warn(_runtime_library_dirs_msg)
+            self._warn_runtime_library_dirs()
 
         # Additional libraries
         libraries.extend(self.dll_libraries)
 
         # handle export symbols by creating a def-file
         # with executables this only works with gcc/ld as linker
-        if (export_symbols is not None) and (
+        if export_symbols and (
             target_desc != self.EXECUTABLE or self.linker_dll == "gcc"
         ):
             # (The linker doesn't do anything if output is up-to-date.
@@ -187,17 +314,18 @@ class CygwinCCompiler(UnixCCompiler):
             # where are the object files
             temp_dir = os.path.dirname(objects[0])
             # name of dll to give the helper files the same base name
-            (dll_name, dll_extension) = os.path.splitext(
-                os.path.basename(output_filename)
-            )
+            dll_file = os.path.basename(output_filename)
+            dll_name = os.path.splitext(dll_file)[0]
 
             # generate the filenames for these files
             def_file = os.path.join(temp_dir, dll_name + ".def")
 
             # Generate .def file
-            contents = ["LIBRARY %s" % os.path.basename(output_filename), "EXPORTS"]
-            for sym in export_symbols:
-                contents.append(sym)
+            contents = [
+                "LIBRARY %s" % dll_file,
+                "EXPORTS",
+                *export_symbols,
+            ]
             self.execute(write_file, (def_file, contents), "writing %s" % def_file)
 
             # next add options for def-file
@@ -205,7 +333,7 @@ class CygwinCCompiler(UnixCCompiler):
             # for gcc/ld the def-file is specified as any object files
             objects.append(def_file)
 
-        # end: if ((export_symbols is not None) and
+        # end: if (export_symbols and
         #        (target_desc != self.EXECUTABLE or self.linker_dll == "gcc")):
 
         # who wants symbols and a many times larger output file
@@ -238,9 +366,16 @@ class CygwinCCompiler(UnixCCompiler):
         # cygwin doesn't support rpath. While in theory we could error
         # out like MSVC does, code might expect it to work like on Unix, so
         # just warn and hope for the best.
-        self.warn(_runtime_library_dirs_msg)
+        self._warn_runtime_library_dirs()
         return []
 
+    def _warn_runtime_library_dirs(self):
+        """Warn about runtime_library_dirs, at most once per process."""
+        global _runtime_library_dirs_warned
+        if not _runtime_library_dirs_warned:
+            self.warn(_runtime_library_dirs_msg)
+            _runtime_library_dirs_warned = True
+
     # -- Miscellaneous methods -----------------------------------------
 
     def _make_out_path(self, output_dir, strip_dir, src_name):
@@ -248,7 +383,7 @@ class CygwinCCompiler(UnixCCompiler):
         norm_src_name = os.path.normcase(src_name)
         return super()._make_out_path(output_dir, strip_dir, norm_src_name)
 
-    @property
+    @functools.cached_property
     def out_extensions(self):
         """
         Add support for rc and res files.
@@ -268,17 +403,11 @@ class Mingw32CCompiler(CygwinCCompiler):
     def __init__(self, verbose=0, dry_run=0, force=0):
         super().__init__(verbose, dry_run, force)
 
-        shared_option = "-shared"
-
         if is_cygwincc(self.cc):
             raise CCompilerError('Cygwin gcc cannot be used with --compiler=mingw32')
 
         self.set_executables(
-            compiler='%s -O -Wall' % self.cc,
-            compiler_so='%s -mdll -O -Wall' % self.cc,
-            compiler_cxx='%s -O -Wall' % self.cxx,
-            linker_exe='%s' % self.cc,
-            linker_so=f'{self.linker_dll} {shared_option}',
+            **_build_exec_dict(self.cc, self.cxx, self.linker_dll, mcygwin=False)
         )
 
     def runtime_library_dir_option(self, dir):
@@ -294,6 +423,7 @@ CONFIG_H_NOTOK = "not ok"
 CONFIG_H_UNCERTAIN = "uncertain"
 
 
+@functools.lru_cache(maxsize=1)
 def check_config_h():
     """Check if the current Python installation appears amenable to building
     extensions with GCC.
@@ -310,28 +440,29 @@ def check_config_h():
     Note there are two ways to conclude "OK": either 'sys.version' contains
     the string "GCC" (implying that this Python was built with GCC), or the
     installed "pyconfig.h" contains the string "__GNUC__".
+
+    The result is cached for the life of the process; call
+    check_config_h.cache_clear() after changing either of them.
     """
 
     # XXX since this function also checks sys.version, it's not strictly a
     # "pyconfig.h" check -- should probably be renamed...
 
-    from distutils import sysconfig
-
     # if sys.version contains GCC then python was compiled with GCC, and the
-    # pyconfig.h file should be OK
-    if "GCC" in sys.version:
-        return CONFIG_H_OK, "sys.version mentions 'GCC'"
-
-    # Clang would also work
-    if "Clang" in sys.version:
-        return CONFIG_H_OK, "sys.version mentions 'Clang'"
+    # pyconfig.h file should be OK; Clang would also work
+    for compiler in ("GCC", "Clang"):
+        if compiler in sys.version:
+            return CONFIG_H_OK, f"sys.version mentions {compiler!r}"
 
     # let's see if __GNUC__ is mentioned in python.h
+    from distutils import sysconfig
+
     fn = sysconfig.get_config_h_filename()
     try:
-        config_h = pathlib.Path(fn).read_text(encoding='utf-8')
+        with open(fn, 'rb') as f:
+            config_h = f.read()
         substring = '__GNUC__'
-        if substring in config_h:
+        if substring.encode('ascii') in config_h:
             code = CONFIG_H_OK
             mention_inflected = 'mentions'
         else:
@@ -342,10 +473,13 @@ def check_config_h():
         return (CONFIG_H_UNCERTAIN, f"couldn't read '{fn}': {exc.strerror}")
 
 
+@functools.lru_cache
 def is_cygwincc(cc):
     """Try to determine if the compiler that would be used is from cygwin."""
-    out_string = check_output(shlex.split(cc) + ['-dumpmachine'])
-    return out_string.strip().endswith(b'cygwin')
+    # commands without quotes or escapes need no shell-style parsing
+    argv = shlex.split(cc) if any(c in cc for c in '\'"\\') else cc.split()
+    out_string = check_output(argv + ['-dumpmachine'])
+    return out_string.rstrip().endswith(b'cygwin')
 
 
 get_versions = None
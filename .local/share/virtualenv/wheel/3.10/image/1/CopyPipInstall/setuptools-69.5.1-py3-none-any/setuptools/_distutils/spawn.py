@@ -15,7 +15,9 @@ from .debug import DEBUG
 from .errors import DistutilsExecError
 
 
-def spawn(cmd, search_path=1, verbose=0, dry_run=0, env=None):  # noqa: C901
+def spawn(  # noqa: C901
+    cmd, search_path=1, verbose=0, dry_run=0, env=None, output=None
+):
     """Run another program, specified as a command list 'cmd', in a new process.
 
     'cmd' is just the argument list for the new process, ie.
@@ -26,7 +28,9 @@ def spawn(cmd, search_path=1, verbose=0, dry_run=0, env=None):  # noqa: C901
     If 'search_path' is true (the default), the system's executable
     search path will be used to find the program; otherwise, cmd[0]
     must be the exact path to the executable.  If 'dry_run' is true,
-    the command will not actually be run.
+    the command will not actually be run.  If 'output' is given, it must
+    be a file object with a file descriptor; the program's stdout and
+    stderr are redirected to it instead of being inherited.
 
     Raise DistutilsExecError if running the program fails in any way; just
     return on success.
@@ -54,7 +58,7 @@ def spawn(cmd, search_path=1, verbose=0, dry_run=0, env=None):  # noqa: C901
             env[MACOSX_VERSION_VAR] = macosx_target_ver
 
     try:
-        proc = subprocess.Popen(cmd, env=env)
+        proc = subprocess.Popen(cmd, env=env, stdout=output, stderr=output)
         proc.wait()
         exitcode = proc.returncode
     except OSError as exc:
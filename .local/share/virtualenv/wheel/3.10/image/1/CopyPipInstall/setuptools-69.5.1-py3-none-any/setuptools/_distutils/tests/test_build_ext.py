@@ -0,0 +1,58 @@
+"""Tests for distutils.command.build_ext."""
+
+import concurrent.futures
+import types
+from distutils.dist import Distribution
+
+import pytest
+
+from ..command.build_ext import build_ext
+from ..extension import Extension
+
+
+@pytest.fixture
+def executors(monkeypatch):
+    """Record the max_workers of every ThreadPoolExecutor created."""
+    created = []
+
+    class RecordingExecutor(concurrent.futures.ThreadPoolExecutor):
+        def __init__(self, max_workers=None, *args, **kwargs):
+            created.append(max_workers)
+            super().__init__(max_workers, *args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, 'ThreadPoolExecutor', RecordingExecutor)
+    return created
+
+
+def make_cmd(monkeypatch, compiler, n_extensions, jobs):
+    cmd = build_ext(Distribution())
+    cmd.parallel = jobs
+    cmd.compiler = compiler
+    cmd.extensions = [Extension(f'ext{i}', [f'ext{i}.c']) for i in range(n_extensions)]
+    built = []
+    monkeypatch.setattr(cmd, 'build_extension', built.append)
+    return cmd, built
+
+
+@pytest.mark.parametrize(
+    'n_extensions, ext_workers, compiler_parallel',
+    [(1, 1, 8), (3, 3, 2), (20, 8, 1)],
+)
+def test_parallel_jobs_split_with_compiler(
+    monkeypatch, executors, n_extensions, ext_workers, compiler_parallel
+):
+    compiler = types.SimpleNamespace(parallel=None)
+    cmd, built = make_cmd(monkeypatch, compiler, n_extensions, jobs=8)
+    cmd._build_extensions_parallel()
+    assert executors == [ext_workers]
+    assert compiler.parallel == compiler_parallel
+    assert built == cmd.extensions
+
+
+def test_parallel_jobs_compiler_without_parallel(monkeypatch, executors):
+    compiler = types.SimpleNamespace()
+    cmd, built = make_cmd(monkeypatch, compiler, n_extensions=3, jobs=8)
+    cmd._build_extensions_parallel()
+    assert executors == [8]
+    assert not hasattr(compiler, 'parallel')
+    assert built == cmd.extensions
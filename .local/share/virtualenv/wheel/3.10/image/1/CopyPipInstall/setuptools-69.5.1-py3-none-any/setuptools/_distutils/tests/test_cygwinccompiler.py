@@ -0,0 +1,256 @@
+"""Tests for distutils.cygwinccompiler."""
+
+import io
+import locale
+import sys
+import threading
+import time
+
+import pytest
+
+from .. import cygwinccompiler
+from ..cygwinccompiler import (
+    CONFIG_H_NOTOK,
+    CONFIG_H_OK,
+    CONFIG_H_UNCERTAIN,
+    CygwinCCompiler,
+    Mingw32CCompiler,
+    check_config_h,
+    get_msvcr,
+)
+from ..errors import CompileError, DistutilsPlatformError
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    check_config_h.cache_clear()
+    get_msvcr.cache_clear()
+    yield
+    check_config_h.cache_clear()
+    get_msvcr.cache_clear()
+
+
+@pytest.fixture
+def config_h(tmp_path, monkeypatch):
+    from distutils import sysconfig
+
+    path = tmp_path / 'pyconfig.h'
+    monkeypatch.setattr(sysconfig, 'get_config_h_filename', lambda: str(path))
+    return path
+
+
+def test_check_config_h(config_h, monkeypatch):
+    # check_config_h looks for "GCC" in sys.version first
+    # returns CONFIG_H_OK if found
+    monkeypatch.setattr(
+        sys,
+        'version',
+        '2.6.1 (r261:67515, Dec  6 2008, 16:42:21) \n[GCC '
+        '4.0.1 (Apple Computer, Inc. build 5370)]',
+    )
+    assert check_config_h()[0] == CONFIG_H_OK
+
+    # then it tries to see if it can find "__GNUC__" in pyconfig.h
+    check_config_h.cache_clear()
+    monkeypatch.setattr(sys, 'version', 'something without the *CC word')
+
+    # if the file doesn't exist it returns  CONFIG_H_UNCERTAIN
+    assert check_config_h()[0] == CONFIG_H_UNCERTAIN
+
+    # if it exists but does not contain __GNUC__, it returns CONFIG_H_NOTOK
+    check_config_h.cache_clear()
+    config_h.write_text('xxx')
+    assert check_config_h()[0] == CONFIG_H_NOTOK
+
+    # and CONFIG_H_OK if __GNUC__ is found
+    check_config_h.cache_clear()
+    config_h.write_text('xxx __GNUC__ xxx')
+    assert check_config_h()[0] == CONFIG_H_OK
+
+
+def test_check_config_h_cached(config_h, monkeypatch):
+    monkeypatch.setattr(sys, 'version', 'something without the *CC word')
+    config_h.write_text('xxx __GNUC__ xxx')
+    assert check_config_h()[0] == CONFIG_H_OK
+    config_h.write_text('xxx')
+    assert check_config_h()[0] == CONFIG_H_OK
+    check_config_h.cache_clear()
+    assert check_config_h()[0] == CONFIG_H_NOTOK
+
+
+def test_get_msvcr(monkeypatch):
+    # gcc
+    monkeypatch.setattr(
+        sys,
+        'version',
+        '2.5.1 (r251:54863, Apr 15 2008, 22:57:26) '
+        '\n[GCC 4.0.1 (Apple Computer, Inc. build 5370)]',
+    )
+    assert get_msvcr() is None
+
+    # MSVC 7.1
+    get_msvcr.cache_clear()
+    monkeypatch.setattr(
+        sys,
+        'version',
+        '2.5.1 (r251:54863, Apr 18 2007, 08:51:08) [MSC v.1310 32 bits (Intel)]',
+    )
+    assert get_msvcr() == ['msvcr71']
+
+    # VS2019 reports a minor toolset version
+    get_msvcr.cache_clear()
+    monkeypatch.setattr(
+        sys, 'version', '3.10.0 (tags/v3.10.0, Oct  4 2021) [MSC v.1929 64 bit (AMD64)]'
+    )
+    assert get_msvcr() == ['vcruntime140']
+
+    # unknown
+    get_msvcr.cache_clear()
+    monkeypatch.setattr(
+        sys,
+        'version',
+        '2.5.1 (r251:54863, Apr 18 2007, 08:51:08) [MSC v.2000 32 bits (Intel)]',
+    )
+    with pytest.raises(ValueError):
+        get_msvcr()
+
+
+def test_get_msvcr_cached(monkeypatch):
+    monkeypatch.setattr(sys, 'version', '3.10.0 [MSC v.1929 64 bit (AMD64)]')
+    assert get_msvcr() == ['vcruntime140']
+    monkeypatch.setattr(sys, 'version', '3.10.0 [GCC 11.2.0]')
+    assert get_msvcr() == ['vcruntime140']
+    get_msvcr.cache_clear()
+    assert get_msvcr() is None
+
+
+@pytest.fixture
+def compiler(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return CygwinCCompiler()
+
+
+def record_compiles(compiler, monkeypatch, fail=None):
+    calls = []
+
+    def _compile(obj, src, ext, cc_args, extra_postargs, pp_opts):
+        calls.append((src, threading.current_thread()))
+        if src == fail:
+            raise CompileError(f"cannot compile {src}")
+
+    monkeypatch.setattr(compiler, '_compile', _compile)
+    return calls
+
+
+SOURCES = ['a.c', 'b.c', 'c.c', 'd.c']
+
+
+def test_compile_serial_by_default(compiler, monkeypatch):
+    assert compiler.parallel is None
+    calls = record_compiles(compiler, monkeypatch)
+    objects = compiler.compile(SOURCES, output_dir='build')
+    assert objects == [f'build/{src[0]}.o' for src in SOURCES]
+    assert [src for src, _ in calls] == SOURCES
+    assert all(thread is threading.main_thread() for _, thread in calls)
+
+
+def test_compile_parallel(compiler, monkeypatch):
+    compiler.parallel = 4
+    calls = record_compiles(compiler, monkeypatch)
+    objects = compiler.compile(SOURCES, output_dir='build')
+    assert objects == [f'build/{src[0]}.o' for src in SOURCES]
+    assert sorted(src for src, _ in calls) == SOURCES
+    assert all(thread is not threading.main_thread() for _, thread in calls)
+
+
+@pytest.mark.parametrize('parallel', [None, 4])
+def test_compile_error(compiler, monkeypatch, parallel):
+    compiler.parallel = parallel
+    record_compiles(compiler, monkeypatch, fail='b.c')
+    with pytest.raises(CompileError, match='cannot compile b.c'):
+        compiler.compile(SOURCES, output_dir='build')
+
+
+def test_compile_parallel_stops_at_first_error(compiler, monkeypatch):
+    compiler.parallel = 2
+    failed = threading.Event()
+    calls = []
+
+    def _compile(obj, src, ext, cc_args, extra_postargs, pp_opts):
+        calls.append(src)
+        if src == 'b.c':
+            failed.set()
+            raise CompileError(f"cannot compile {src}")
+        # keep the worker busy until the failure has been seen
+        failed.wait(timeout=5)
+        time.sleep(0.1)
+
+    monkeypatch.setattr(compiler, '_compile', _compile)
+    with pytest.raises(CompileError, match='cannot compile b.c'):
+        compiler.compile(SOURCES, output_dir='build')
+    assert sorted(calls) == ['a.c', 'b.c']
+
+
+FAKE_CC = """
+import sys, time
+src = sys.argv[sys.argv.index('-o') - 1]
+out = sys.stderr.buffer
+out.write(b'start ' + src.encode() + b'\\n')
+out.flush()
+time.sleep(0.05)
+# a path in the ANSI code page, as MinGW gcc on Windows would print it
+out.write(b'C:\\\\Users\\\\J\\xfcrgen\\n')
+out.write(b'end ' + src.encode() + b'\\n')
+"""
+
+
+@pytest.fixture
+def fake_cc(compiler, tmp_path):
+    path = tmp_path / 'fake_cc.py'
+    path.write_text(FAKE_CC)
+    compiler.compiler_so = [sys.executable, str(path)]
+    compiler.parallel = 4
+    return path
+
+
+def test_compile_parallel_output(compiler, fake_cc, capsysbinary):
+    compiler.compile(SOURCES, output_dir='build')
+    err = capsysbinary.readouterr().err
+    for src in SOURCES:
+        block = b'start %s\nC:\\Users\\J\xfcrgen\nend %s\n' % (
+            src.encode(),
+            src.encode(),
+        )
+        assert block in err
+
+
+def test_compile_parallel_output_text_stream(compiler, fake_cc, monkeypatch):
+    # streams without a byte buffer get the output in the locale encoding
+    stream = io.StringIO()
+    monkeypatch.setattr(sys, 'stderr', stream)
+    monkeypatch.setattr(locale, 'getpreferredencoding', lambda do_setlocale: 'cp1252')
+    compiler.compile(SOURCES, output_dir='build')
+    for src in SOURCES:
+        assert f'start {src}\nC:\\Users\\Jürgen\nend {src}\n' in stream.getvalue()
+
+
+def test_runtime_library_dirs_warns_once(compiler, monkeypatch):
+    monkeypatch.setattr(cygwinccompiler, '_runtime_library_dirs_warned', False)
+    warnings = []
+    monkeypatch.setattr(CygwinCCompiler, 'warn', lambda self, msg: warnings.append(msg))
+    monkeypatch.setattr(CygwinCCompiler, 'spawn', lambda self, cmd, **kwargs: None)
+    compiler.dll_libraries = []
+    compiler.link(
+        CygwinCCompiler.SHARED_OBJECT,
+        ['a.o'],
+        'a.dll',
+        runtime_library_dirs=['lib_a', 'lib_b'],
+    )
+    assert CygwinCCompiler().runtime_library_dir_option('lib_c') == []
+    assert warnings == [cygwinccompiler._runtime_library_dirs_msg]
+
+
+def test_mingw32_runtime_library_dir_option(compiler, monkeypatch):
+    monkeypatch.setattr(cygwinccompiler, 'is_cygwincc', lambda cc: False)
+    with pytest.raises(DistutilsPlatformError):
+        Mingw32CCompiler().runtime_library_dir_option('lib_a')